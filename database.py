@@ -3,23 +3,38 @@
 Resource-optimized database manager with single connection pattern
 """
 import aiosqlite
+import asyncio
+import itertools
 from datetime import datetime, timedelta
 import logging
-from typing import List, Dict
+from typing import List, Dict, Tuple, Set, Optional
 from config import BotConfig
 import csv
+import os
 
 logger = logging.getLogger(__name__)
 
+MAX_IMPORT_BYTES = 10 * 1024 * 1024  # Reject CSV imports larger than 10 MB
+
 class DatabaseManager:
     def __init__(self, config: BotConfig):
         self.db_path = str(config.paths.user_db)
         self._connection = None
+        self._connection_lock = asyncio.Lock()
+        self._chat_ids: Optional[Set[int]] = None
 
     async def _get_connection(self) -> aiosqlite.Connection:
         """Get or create the database connection"""
         if self._connection is None:
-            self._connection = await aiosqlite.connect(self.db_path)
+            # Concurrent first callers must share one connection
+            async with self._connection_lock:
+                if self._connection is None:
+                    conn = await aiosqlite.connect(self.db_path)
+                    # WAL lets reads proceed while activity flushes and imports write
+                    await conn.execute('PRAGMA journal_mode=WAL')
+                    await conn.execute('PRAGMA synchronous=NORMAL')
+                    await conn.execute('PRAGMA temp_store=MEMORY')
+                    self._connection = conn
         return self._connection
 
     async def cleanup(self):
@@ -37,6 +52,9 @@ class DatabaseManager:
 
     async def _ensure_chat_table(self, conn: aiosqlite.Connection, chat_id: int) -> None:
         """Create chat-specific table if it doesn't exist"""
+        known_chat_ids = await self._get_known_chat_ids(conn)
+        if chat_id in known_chat_ids:
+            return
         table_name = self._get_table_name(chat_id)
         await conn.execute(f'''
             CREATE TABLE IF NOT EXISTS {table_name} (
@@ -52,35 +70,56 @@ class DatabaseManager:
             ON {table_name}(last_active)
         ''')
         await conn.commit()
+        known_chat_ids.add(chat_id)
+
+    async def update_user_activity_many(self, entries: List[Tuple[int, int, int, float]]) -> None:
+        """Apply a batch of (user_id, chat_id, message_count, timestamp) activity updates in one commit"""
+        by_chat: Dict[int, List[Tuple[int, datetime, int]]] = {}
+        for user_id, chat_id, count, timestamp in entries:
+            by_chat.setdefault(chat_id, []).append((user_id, datetime.fromtimestamp(timestamp), count))
 
-    async def update_user_activity(self, user_id: int, chat_id: int) -> None:
-        """Update user's last activity time"""
         conn = await self._get_connection()
-        await self._ensure_chat_table(conn, chat_id)
-        table_name = self._get_table_name(chat_id)
-        
-        await conn.execute(f'''
-            INSERT INTO {table_name} (user_id, last_active, messages_count)
-            VALUES (?, ?, 1)
-            ON CONFLICT(user_id) DO UPDATE SET 
-                last_active = excluded.last_active,
-                messages_count = messages_count + 1
-        ''', (user_id, datetime.now()))
+        for chat_id, rows in by_chat.items():
+            await self._ensure_chat_table(conn, chat_id)
+            table_name = self._get_table_name(chat_id)
+            await conn.executemany(f'''
+                INSERT INTO {table_name} (user_id, last_active, messages_count)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET 
+                    last_active = excluded.last_active,
+                    messages_count = messages_count + excluded.messages_count
+            ''', rows)
         await conn.commit()
 
-    async def get_inactive_users(self, chat_id: int, days: int) -> List[int]:
-        """Get users inactive for specified number of days"""
+    async def _query_chat_tables(self, conn: aiosqlite.Connection, select: str,
+                                 params: Dict[int, object], chunk_size: int = 200) -> List[Tuple]:
+        """Run a SELECT template, formatted with {chat_id} and {table}, over each chat's table"""
+        chat_ids = list(params)
+        # SQLite caps compound SELECTs, so chats are read in chunks of UNION ALL queries
+        results = []
+        for start in range(0, len(chat_ids), chunk_size):
+            chunk = chat_ids[start:start + chunk_size]
+            query = ' UNION ALL '.join(
+                select.format(chat_id=chat_id, table=self._get_table_name(chat_id))
+                for chat_id in chunk
+            )
+            cursor = await conn.execute(query, [params[chat_id] for chat_id in chunk])
+            results.extend(await cursor.fetchall())
+        return results
+
+    async def get_inactive_users_many(self, thresholds: Dict[int, int]) -> List[Tuple[int, int]]:
+        """Get (chat_id, user_id) pairs inactive past each chat's threshold in days"""
         conn = await self._get_connection()
-        await self._ensure_chat_table(conn, chat_id)
-        table_name = self._get_table_name(chat_id)
-        
-        cursor = await conn.execute(f'''
-            SELECT user_id 
-            FROM {table_name} 
-            WHERE last_active < ?
-        ''', (datetime.now() - timedelta(days=days),))
-        
-        return [row[0] for row in await cursor.fetchall()]
+        known_chat_ids = await self._get_known_chat_ids(conn)
+        now = datetime.now()
+        cutoffs = {
+            chat_id: now - timedelta(days=days)
+            for chat_id, days in thresholds.items()
+            if chat_id in known_chat_ids
+        }
+        return await self._query_chat_tables(
+            conn, 'SELECT {chat_id}, user_id FROM {table} WHERE last_active < ?', cutoffs
+        )
 
     async def get_chat_statistics(self, chat_id: int) -> Dict[str, any]:
         """Get statistics for a specific chat"""
@@ -108,13 +147,20 @@ class DatabaseManager:
     async def get_all_chat_ids(self) -> List[int]:
         """Get all chat IDs from the database"""
         conn = await self._get_connection()
+        return list(await self._get_known_chat_ids(conn))
+
+    async def _get_known_chat_ids(self, conn: aiosqlite.Connection) -> Set[int]:
+        """Get cached set of chat IDs with tables, loading it on first use"""
+        if self._chat_ids is not None:
+            return self._chat_ids
+
         cursor = await conn.execute('''
             SELECT name FROM sqlite_master 
             WHERE type='table' AND name LIKE 'chat_%' OR name LIKE 'chat_n%'
         ''')
         tables = await cursor.fetchall()
         
-        chat_ids = []
+        chat_ids = set()
         for (table_name,) in tables:
             try:
                 if table_name.startswith('chat_n'):
@@ -123,10 +169,11 @@ class DatabaseManager:
                 else:
                     # Handle positive chat IDs
                     chat_id = int(table_name[5:])
-                chat_ids.append(chat_id)
+                chat_ids.add(chat_id)
             except ValueError:
                 continue
                 
+        self._chat_ids = chat_ids
         return chat_ids
 
     async def get_chat_user_activity(self, chat_id: int, limit: int = 50) -> List[Dict]:
@@ -158,58 +205,80 @@ class DatabaseManager:
         """Remove tables for chats that have been completely inactive"""
         conn = await self._get_connection()
         threshold = datetime.now() - timedelta(days=max_days_inactive)
+        known_chat_ids = await self._get_known_chat_ids(conn)
         
-        cursor = await conn.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name LIKE 'chat_%'
-        ''')
-        tables = await cursor.fetchall()
+        # Compare each chat's latest activity in SQL
+        rows = await self._query_chat_tables(
+            conn, 'SELECT {chat_id}, MAX(last_active) < ? FROM {table}',
+            dict.fromkeys(known_chat_ids, threshold)
+        )
+        stale_chat_ids = [chat_id for chat_id, is_stale in rows if is_stale]
         
-        for (table_name,) in tables:
-            cursor = await conn.execute(f'''
-                SELECT MAX(last_active) FROM {table_name}
-            ''')
-            last_active = await cursor.fetchone()
-            
-            if last_active and last_active[0] and last_active[0] < threshold:
-                await conn.execute(f'DROP TABLE {table_name}')
-        
-        await conn.commit()
+        if stale_chat_ids:
+            # Forget the chats before dropping, and drop them in one queued script,
+            # so writes that arrive meanwhile run after the drops and recreate their tables
+            known_chat_ids.difference_update(stale_chat_ids)
+            await conn.executescript(''.join(
+                f'DROP TABLE {self._get_table_name(chat_id)};' for chat_id in stale_chat_ids
+            ))
+            logger.info(f"Removed {len(stale_chat_ids)} inactive chat tables")
 
-    async def import_users_from_file(self, file_path: str, default_chat_id: int = None) -> Dict[str, any]:
-        """Import user IDs from a CSV file"""
+    async def import_users_from_file(self, file_path: str, default_chat_id: int = None,
+                                     batch_size: int = 1000,
+                                     max_bytes: int = MAX_IMPORT_BYTES) -> Dict[str, any]:
+        """Import user IDs from a CSV file, streaming rows in batches"""
         stats = {'processed': 0, 'success': 0, 'errors': 0, 'error_details': []}
         
         with open(file_path, newline='') as csvfile:
-            header = csvfile.readline().strip().lower()
-            csvfile.seek(0)
+            file_size = os.fstat(csvfile.fileno()).st_size
+            if file_size > max_bytes:
+                raise ValueError(f"File is too large ({file_size} bytes, limit {max_bytes})")
             
-            has_chat_id = 'chat_id' in header
             reader = csv.DictReader(csvfile)
+            fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            reader.fieldnames = fieldnames
             
+            has_chat_id = 'chat_id' in fieldnames
             if not has_chat_id and default_chat_id is None:
                 raise ValueError("No chat_id column and no default_chat_id provided")
             
             conn = await self._get_connection()
-            for row in reader:
-                stats['processed'] += 1
-                try:
-                    user_id = int(row['user_id'])
-                    chat_id = int(row['chat_id']) if has_chat_id else default_chat_id
-                    
-                    await self._ensure_chat_table(conn, chat_id)
-                    await conn.execute(f'''
-                        INSERT INTO {self._get_table_name(chat_id)} 
-                        (user_id, last_active, messages_count)
-                        VALUES (?, ?, ?)
-                        ON CONFLICT(user_id) DO UPDATE SET
-                        last_active = excluded.last_active
-                    ''', (user_id, datetime.now(), 0))
-                    stats['success'] += 1
-                    
-                except Exception as e:
-                    stats['errors'] += 1
-                    stats['error_details'].append(f"Row {stats['processed']}: {str(e)}")
+            ensured_chats = set()
+            while True:
+                # Parse the next chunk off the event loop
+                chunk = await asyncio.to_thread(list, itertools.islice(reader, batch_size))
+                if not chunk:
+                    break
+                
+                by_chat: Dict[int, List[Tuple[int, datetime, int]]] = {}
+                now = datetime.now()
+                for row in chunk:
+                    stats['processed'] += 1
+                    try:
+                        user_id = int(row['user_id'])
+                        chat_id = int(row['chat_id']) if has_chat_id else default_chat_id
+                        by_chat.setdefault(chat_id, []).append((user_id, now, 0))
+                    except Exception as e:
+                        stats['errors'] += 1
+                        stats['error_details'].append(f"Row {stats['processed']}: {str(e)}")
+                
+                for chat_id, rows in by_chat.items():
+                    try:
+                        if chat_id not in ensured_chats:
+                            await self._ensure_chat_table(conn, chat_id)
+                            ensured_chats.add(chat_id)
+                        await conn.executemany(f'''
+                            INSERT INTO {self._get_table_name(chat_id)} 
+                            (user_id, last_active, messages_count)
+                            VALUES (?, ?, ?)
+                            ON CONFLICT(user_id) DO UPDATE SET
+                            last_active = excluded.last_active
+                        ''', rows)
+                        stats['success'] += len(rows)
+                    except Exception as e:
+                        stats['errors'] += len(rows)
+                        stats['error_details'].append(f"Chat {chat_id} batch of {len(rows)} rows: {str(e)}")
+                
+                await conn.commit()
             
-            await conn.commit()
-            return stats
\ No newline at end of file
+            return stats
@@ -3,31 +3,161 @@
 Message and command handlers with improved database interactions
 """
 from telegram import Update
-from telegram.ext import CallbackContext
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import CallbackContext, filters
 import logging
+import deep_translator.google
 from deep_translator import GoogleTranslator
+import requests
+from requests.adapters import HTTPAdapter
 import os
 import re
 import asyncio
-from typing import List, Dict
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Set, Tuple, NamedTuple, Iterable, Iterator
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 from config import BotConfig
 from database import DatabaseManager
 from server_config import ServerConfigManager
 
 logger = logging.getLogger(__name__)
 
-# Initialize translator
-logger.info("Initializing translators...")
-try:
-    translator_en_to_zh = GoogleTranslator(source='en', target='zh-CN')
-    translator_zh_to_en = GoogleTranslator(source='zh-CN', target='en')
-    logger.info("Translators initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize translator: {e}", exc_info=True)
+# Dedicated pool for blocking translator HTTP calls
+TRANSLATE_POOL_SIZE = 16
+TRANSLATE_POOL = ThreadPoolExecutor(max_workers=TRANSLATE_POOL_SIZE, thread_name_prefix='translate')
+
+# Keep-alive HTTP session shared by all translator calls, so TLS handshakes are reused
+translate_session = requests.Session()
+translate_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=TRANSLATE_POOL_SIZE))
+deep_translator.google.requests = translate_session
+
+# GoogleTranslator mutates its request params on every call, so each pool thread gets its own pair
+_thread_translators = threading.local()
+
+def _get_translator(src: str) -> GoogleTranslator:
+    """Get this thread's translator for the given source language"""
+    translators = getattr(_thread_translators, 'translators', None)
+    if translators is None:
+        translators = {
+            'en': GoogleTranslator(source='en', target='zh-CN'),
+            'zh': GoogleTranslator(source='zh-CN', target='en')
+        }
+        _thread_translators.translators = translators
+    return translators[src]
+
+# Buffered activity updates keyed by (user_id, chat_id) -> (message_count, last_timestamp)
+ACTIVITY_FLUSH_INTERVAL = 1
+ACTIVITY_FLUSH_SIZE = 500
+_ACTIVITY_BUFFER: Dict[Tuple[int, int], Tuple[int, float]] = {}
+_ACTIVITY_LOCK = asyncio.Lock()
+
+async def record_user_activity(db, user_id: int, chat_id: int) -> None:
+    """Queue an activity update, flushing early if the buffer is full"""
+    key = (user_id, chat_id)
+    async with _ACTIVITY_LOCK:
+        count, _ = _ACTIVITY_BUFFER.get(key, (0, 0.0))
+        _ACTIVITY_BUFFER[key] = (count + 1, time.time())
+        buffer_full = len(_ACTIVITY_BUFFER) >= ACTIVITY_FLUSH_SIZE
+    if buffer_full:
+        await flush_activity_buffer(db)
+
+async def flush_activity_buffer(db) -> None:
+    """Write all buffered activity updates to the database"""
+    async with _ACTIVITY_LOCK:
+        batch = [
+            (user_id, chat_id, count, timestamp)
+            for (user_id, chat_id), (count, timestamp) in _ACTIVITY_BUFFER.items()
+        ]
+        _ACTIVITY_BUFFER.clear()
+    if batch:
+        try:
+            await db.update_user_activity_many(batch)
+            logger.debug("Flushed activity for %d users", len(batch))
+        except Exception as e:
+            logger.error(f"Error flushing activity buffer: {e}", exc_info=True)
+
+async def activity_flush_loop(db, stop: asyncio.Event) -> None:
+    """Background task that periodically flushes buffered activity updates until stop is set"""
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), ACTIVITY_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        await flush_activity_buffer(db)
+
+# Short-lived caches for Telegram chat and member lookups
+_MEMBER_CACHE: TTLCache = TTLCache(maxsize=10000, ttl=60)
+_CHAT_CACHE: TTLCache = TTLCache(maxsize=1000, ttl=300)
+
+async def get_chat_member_cached(bot, chat_id: int, user_id: int):
+    """Get chat member, reusing recent lookups"""
+    key = (chat_id, user_id)
+    member = _MEMBER_CACHE.get(key)
+    if member is None:
+        member = await bot.get_chat_member(chat_id, user_id)
+        _MEMBER_CACHE[key] = member
+    return member
+
+async def get_chat_cached(bot, chat_id: int):
+    """Get chat, reusing recent lookups"""
+    chat = _CHAT_CACHE.get(chat_id)
+    if chat is None:
+        chat = await bot.get_chat(chat_id)
+        _CHAT_CACHE[chat_id] = chat
+    return chat
+
+async def handle_chat_member_update(update: Update, context: CallbackContext, **kwargs) -> None:
+    """Drop cached member and admin info when a member's status changes"""
+    member_update = update.chat_member or update.my_chat_member
+    if member_update:
+        _MEMBER_CACHE.pop((member_update.chat.id, member_update.new_chat_member.user.id), None)
+        _ADMIN_CACHE.pop(member_update.chat.id, None)
+
+WARMUP_TRANSLATE_TIMEOUT = 5  # Seconds startup waits on the translator before polling begins
+
+async def warmup(db, config_manager) -> None:
+    """Pre-load chat configs and open translator connections before first use"""
+    try:
+        chat_ids = await db.get_all_chat_ids()
+        await asyncio.gather(*(config_manager.get_config(chat_id) for chat_id in chat_ids))
+        logger.info(f"Warmup completed for {len(chat_ids)} chats")
+    except Exception as e:
+        logger.warning(f"Warmup failed: {e}")
+
+    # The translator has no HTTP timeout, so don't let a slow endpoint hold up startup
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                translate_text('en', 'hello'),
+                translate_text('zh', '你好')
+            ),
+            timeout=WARMUP_TRANSLATE_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Translator warmup timed out after {WARMUP_TRANSLATE_TIMEOUT}s")
+    except Exception as e:
+        logger.warning(f"Translator warmup failed: {e}")
+
+_ADMIN_STATUSES = frozenset(('administrator', 'creator'))
+_ADMIN_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=300)
+
+async def get_chat_admin_ids(bot, chat_id: int) -> frozenset:
+    """Get IDs of a chat's administrators, fetching the full list at most every 5 minutes"""
+    admin_ids = _ADMIN_CACHE.get(chat_id)
+    if admin_ids is None:
+        admins = await bot.get_chat_administrators(chat_id)
+        admin_ids = frozenset(m.user.id for m in admins if m.status in _ADMIN_STATUSES)
+        _ADMIN_CACHE[chat_id] = admin_ids
+    return admin_ids
 
 async def is_admin(update: Update, context: CallbackContext, config: BotConfig) -> bool:
     """Check if user is admin, creator, or bot owner"""
-    logger.debug(f"Checking admin status for user {update.effective_user.id}")
+    logger.debug("Checking admin status for user %s", update.effective_user.id)
     try:
         user = update.effective_user
         chat = update.effective_chat
@@ -36,83 +166,385 @@ async def is_admin(update: Update, context: CallbackContext, config: BotConfig)
             return False
             
         if user.id == config.BOT_OWNER_ID:
-            logger.info(f"User {user.id} is bot owner")
+            logger.info("User %s is bot owner", user.id)
             return True
             
-        member = await context.bot.get_chat_member(chat.id, user.id)
-        is_admin = member.status in ['administrator', 'creator']
-        logger.info(f"User {user.id} admin status: {is_admin} ({member.status})")
+        if chat.type == 'private':
+            return False
+            
+        admin_ids = await get_chat_admin_ids(context.bot, chat.id)
+        is_admin = user.id in admin_ids
+        logger.info("User %s admin status: %s", user.id, is_admin)
         return is_admin
     except Exception as e:
         logger.error(f"Error checking admin status: {e}", exc_info=True)
         return False
 
+_HAS_LETTERS_RE = re.compile(r'[A-Za-z\u4e00-\u9fff]')
+# Translate table that deletes CJK unified ideographs
+_STRIP_CJK = dict.fromkeys(range(0x4e00, 0xa000))
+_URL_RE = re.compile(r'^(https?://|www\.)\S+$', re.IGNORECASE)
+
+def is_translatable(text: str) -> bool:
+    """Check whether text is worth sending to the translator"""
+    if not text:
+        return False
+    text = text.strip()
+    if len(text) < 2 or text.startswith('/'):
+        return False
+    if _URL_RE.match(text):
+        return False
+    return _HAS_LETTERS_RE.search(text) is not None
+
 def detect_language(text: str) -> str:
     """Detect if text is primarily Chinese or English"""
-    chinese_char_pattern = re.compile(r'[\u4e00-\u9fff]')
-    chinese_chars = len(chinese_char_pattern.findall(text))
-    total_chars = len(text.replace(" ", ""))
-    return 'zh' if chinese_chars / total_chars > 0.5 else 'en'
+    if not text or text.isspace() or text.isascii():
+        return 'en'
+    chinese_chars = len(text) - len(text.translate(_STRIP_CJK))
+    total_chars = len(text) - text.count(' ')
+    return 'zh' if chinese_chars * 2 > total_chars else 'en'
 
-async def handle_message(
+# Recently used translations, evicted by recency and expired after an hour; shared by pool threads
+TRANSLATION_CACHE_SIZE = 4096
+TRANSLATION_CACHE_TTL = 3600
+_TRANSLATION_CACHE = TTLCache(maxsize=TRANSLATION_CACHE_SIZE, ttl=TRANSLATION_CACHE_TTL)
+_TRANSLATION_CACHE_LOCK = threading.Lock()
+
+def _translate(src: str, text: str) -> str:
+    """Translate text from the given source language"""
+    return _get_translator('zh' if src == 'zh' else 'en').translate(text)
+
+@cached(_TRANSLATION_CACHE, lock=_TRANSLATION_CACHE_LOCK)
+def _translate_cached(src: str, text: str) -> str:
+    """Translate text from the given source language, memoizing results"""
+    return _translate(src, text)
+
+def get_cached_translation(src: str, text: str):
+    """Get a memoized translation, or None if it is not cached"""
+    with _TRANSLATION_CACHE_LOCK:
+        return _TRANSLATION_CACHE.get(hashkey(src, text))
+
+def cache_translation(src: str, text: str, translated: str) -> None:
+    """Memoize a translation obtained outside _translate_cached"""
+    with _TRANSLATION_CACHE_LOCK:
+        _TRANSLATION_CACHE[hashkey(src, text)] = translated
+
+async def translate_text(src: str, text: str, use_cache: bool = True) -> str:
+    """Translate text off the event loop using the translator pool"""
+    loop = asyncio.get_running_loop()
+    translate = _translate_cached if use_cache else _translate
+    return await loop.run_in_executor(TRANSLATE_POOL, translate, src, text)
+
+class TranslationBatcher:
+    """Coalesce translation requests arriving close together into one HTTP call"""
+    SEPARATOR = '\n<<>>\n'
+    MAX_CHARS = 4500  # Stay under the translator's 5000 character limit
+
+    TIMEOUT = 10  # Seconds before a translator call fails its batch; the HTTP client has no timeout
+
+    def __init__(self, window: float = 0.05, max_batch: int = 32):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self._batches: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the background batching task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background batching task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for batch_task in list(self._batches):
+            batch_task.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, text: str, src: str) -> str:
+        """Queue text for translation and wait for the result"""
+        if self._task is None:
+            return await asyncio.wait_for(translate_text(src, text), self.TIMEOUT)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((src, text, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Each batch runs on its own, so a slow translator call never holds up later batches
+            batch_task = asyncio.create_task(self._translate_batch(batch))
+            self._batches.add(batch_task)
+            batch_task.add_done_callback(self._batches.discard)
+
+    async def _translate_batch(self, batch: List[Tuple[str, str, asyncio.Future]]) -> None:
+        """Translate a batch grouped by source language, cancelling its waiters if stopped"""
+        groups: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        for src, text, future in batch:
+            groups.setdefault(src, []).append((text, future))
+        try:
+            await asyncio.gather(*(self._translate_group(src, items) for src, items in groups.items()))
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+
+    async def _translate_group(self, src: str, items: List[Tuple[str, asyncio.Future]]) -> None:
+        """Translate one language group, falling back to per-text calls if the split fails"""
+        texts = [text for text, _ in items]
+        # Only texts missing from the cache go to the translator
+        results = [get_cached_translation(src, text) for text in texts]
+        misses = [i for i, result in enumerate(results) if result is None]
+        miss_texts = [texts[i] for i in misses]
+
+        translated_misses = None
+        joined = self.SEPARATOR.join(miss_texts)
+        if len(miss_texts) > 1 and len(joined) <= self.MAX_CHARS:
+            try:
+                # The joined payload is never requested again, so it bypasses the cache
+                translated = await asyncio.wait_for(translate_text(src, joined, use_cache=False), self.TIMEOUT)
+                parts = [part.strip() for part in translated.split(self.SEPARATOR.strip())]
+                if len(parts) == len(miss_texts):
+                    translated_misses = parts
+                    for text, part in zip(miss_texts, parts):
+                        cache_translation(src, text, part)
+                else:
+                    logger.debug("Batch split mismatch (%d != %d), retrying individually", len(parts), len(miss_texts))
+            except asyncio.TimeoutError as e:
+                # The translator is hanging, so retrying each text would only wait again
+                logger.warning(f"Batch translation timed out after {self.TIMEOUT}s")
+                translated_misses = [e] * len(miss_texts)
+            except Exception as e:
+                logger.warning(f"Batch translation failed, retrying individually: {e}")
+
+        if translated_misses is None:
+            translated_misses = await asyncio.gather(
+                *(asyncio.wait_for(translate_text(src, text), self.TIMEOUT) for text in miss_texts),
+                return_exceptions=True
+            )
+
+        for i, result in zip(misses, translated_misses):
+            results[i] = result
+
+        for (_, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+translation_batcher = TranslationBatcher()
+
+async def handle_text_message(
     update: Update,
     context: CallbackContext,
-    db,
     config_manager,
     **kwargs
 ) -> None:
-    """Handle regular messages with translation support"""
+    """Handle regular text messages with translation support"""
+    msg = update.message
+    if not msg or not msg.text or not update.effective_user:
+        return
+
+    # Never translate bot output or inline-bot results to avoid feedback loops
+    if (msg.from_user and msg.from_user.is_bot) or msg.via_bot:
+        return
+
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
-    text = update.message.text
+    text = msg.text
     sender_name = update.effective_user.first_name or update.effective_user.username
 
-    logger.info(f"Handling message from user {user_id} ({sender_name}) in chat {chat_id}")
+    logger.info("Handling message from user %s (%s) in chat %s", user_id, sender_name, chat_id)
 
     try:
         # Get chat-specific config
         chat_config = await config_manager.get_config(chat_id)
         
-        if (chat_config['translate_zh_to_en'] or chat_config['translate_en_to_zh']) and text:
+        if (chat_config.translate_zh_to_en or chat_config.translate_en_to_zh) and is_translatable(text):
             logger.debug("Translation is enabled")
             
             detected_lang = detect_language(text)
-            logger.info(f"Detected language: {detected_lang}")
+            logger.info("Detected language: %s", detected_lang)
             
-            if detected_lang == 'zh' and chat_config['translate_zh_to_en']:
-                translated = translator_zh_to_en.translate(text)
-            elif detected_lang == 'en' and chat_config['translate_en_to_zh']:
-                translated = translator_en_to_zh.translate(text)
+            if (detected_lang == 'zh' and chat_config.translate_zh_to_en) or \
+                    (detected_lang == 'en' and chat_config.translate_en_to_zh):
+                translated = await translation_batcher.submit(text.strip(), detected_lang)
             else:
                 translated = None
 
             if translated and translated != text:
                 reply_text = f"{sender_name}: {translated}"
                 await update.message.reply_text(reply_text)
-                logger.info(f"Translated message sent from {sender_name}: {translated}")
-        
-        # Update activity time
-        logger.debug(f"Updating activity time for user {user_id}")
-        await db.update_user_activity(user_id, chat_id)
+                logger.info("Translated message sent from %s: %.200s", sender_name, translated)
         
     except Exception as e:
-        logger.error(f"Error in handle_message: {e}", exc_info=True)
+        logger.error(f"Error in handle_text_message: {e}", exc_info=True)
 
-async def delete_message_after_delay(message, delay_seconds: int = 15):
-    """Delete a message after specified delay"""
-    try:
-        await asyncio.sleep(delay_seconds)
-        await message.delete()
-    except Exception as e:
-        logger.warning(f"Failed to delete message: {e}")
+async def handle_any_activity(
+    update: Update,
+    context: CallbackContext,
+    db,
+    **kwargs
+) -> None:
+    """Record activity for any message a user sends"""
+    if not update.effective_user or not update.effective_chat:
+        return
 
-async def delete_command_message(update: Update) -> None:
-    """Delete the command message after a short delay"""
+    user_id = update.effective_user.id
     try:
-        await asyncio.sleep(5)
-        await update.message.delete()
+        # Queue activity update for the background flusher
+        logger.debug("Queueing activity update for user %s", user_id)
+        await record_user_activity(db, user_id, update.effective_chat.id)
     except Exception as e:
-        logger.warning(f"Failed to delete command message: {e}")
+        logger.error(f"Error in handle_any_activity: {e}", exc_info=True)
+
+# Plain text that is not a command is eligible for translation
+TEXT_NOCMD = filters.TEXT & ~filters.COMMAND
+
+async def handle_message(
+    update: Update,
+    context: CallbackContext,
+    db,
+    config_manager,
+    **kwargs
+) -> None:
+    """Record activity for any user message, then translate it if it is plain text"""
+    await handle_any_activity(update, context, db)
+    if TEXT_NOCMD.check_update(update):
+        await handle_text_message(update, context, config_manager)
+
+# Pending deletes as a min-heap of (due_time, sequence, message), drained by one scheduler task
+MAX_PENDING_DELETES = 10000
+_DELETE_HEAP: List[Tuple[float, int, object]] = []
+_DELETE_SEQUENCE = itertools.count()
+_DELETE_WAKE = asyncio.Event()
+# Latest due time per (chat_id, message_id); heap entries with an older due time were rescheduled
+_DELETE_DUE: Dict[Tuple[int, int], float] = {}
+
+def schedule_delete(message, delay_seconds: int = 15) -> None:
+    """Schedule a message for deletion after specified delay, replacing any earlier schedule for it"""
+    if len(_DELETE_HEAP) >= MAX_PENDING_DELETES:
+        logger.warning("Too many pending deletes, message will not be auto-deleted")
+        return
+    due = time.monotonic() + delay_seconds
+    _DELETE_DUE[(message.chat_id, message.message_id)] = due
+    heapq.heappush(_DELETE_HEAP, (due, next(_DELETE_SEQUENCE), message))
+    _DELETE_WAKE.set()
+
+def schedule_command_delete(update: Update) -> None:
+    """Schedule the command message for deletion after a short delay"""
+    if update.message:
+        schedule_delete(update.message, 5)
+
+async def delete_scheduler() -> None:
+    """Sleep until the earliest pending delete is due, then delete everything that is due"""
+    while True:
+        if not _DELETE_HEAP:
+            await _DELETE_WAKE.wait()
+            _DELETE_WAKE.clear()
+            continue
+
+        delay = _DELETE_HEAP[0][0] - time.monotonic()
+        if delay > 0:
+            _DELETE_WAKE.clear()
+            try:
+                await asyncio.wait_for(_DELETE_WAKE.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        now = time.monotonic()
+        due = []
+        while _DELETE_HEAP and _DELETE_HEAP[0][0] <= now:
+            due_time, _, message = heapq.heappop(_DELETE_HEAP)
+            key = (message.chat_id, message.message_id)
+            if _DELETE_DUE.get(key) != due_time:
+                continue  # Superseded by a later schedule
+            del _DELETE_DUE[key]
+            # A deleted status message can no longer be edited in place
+            status = _STATUS_MESSAGES.get(message.chat_id)
+            if status is not None and status.message_id == message.message_id:
+                del _STATUS_MESSAGES[message.chat_id]
+            due.append(message)
+        for result in await gather_bounded(message.delete() for message in due):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to delete message: {result}")
+
+def start_delete_scheduler() -> asyncio.Task:
+    """Start the message deletion scheduler"""
+    return asyncio.create_task(delete_scheduler())
+
+# Last settings status message per chat, edited in place on subsequent changes
+_STATUS_MESSAGES: Dict[int, object] = {}
+
+async def reply_status(update: Update, context: CallbackContext, text: str) -> None:
+    """Show a settings status message, editing the chat's previous one when possible"""
+    chat_id = update.effective_chat.id
+    status = _STATUS_MESSAGES.get(chat_id)
+    if status is not None:
+        try:
+            await context.bot.edit_message_text(text, chat_id=chat_id, message_id=status.message_id)
+            # Keep the updated status visible for a full delay
+            schedule_delete(status)
+            return
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                schedule_delete(status)
+                return
+            logger.debug(f"Status message {status.message_id} not editable, sending a new one: {e}")
+        except TelegramError as e:
+            logger.warning(f"Failed to edit status message {status.message_id}: {e}")
+        _STATUS_MESSAGES.pop(chat_id, None)
+    response = await update.message.reply_text(text)
+    _STATUS_MESSAGES[chat_id] = response
+    schedule_delete(response)
+
+# Help text templates, filled in with the chat's current settings
+_HELP_BASE = (
+    "*Translations (翻译设置):*\n"
+    "Toggle EN→ZH translation (开关英中翻译):\n"
+    "\t\t/toggle\\_translation\\_en\\_to\\_zh\n"
+    "Toggle ZH→EN translation (开关中英翻译):\n"
+    "\t\t/toggle\\_translation\\_zh\\_to\\_en\n"
+    "Current Setting:\n"
+    "EN→ZH (英中翻译) {en_zh}, "
+    "ZH→EN (中英翻译) {zh_en}\n"
+)
+# Base help text is fully determined by the two translation flags, so render every combination once
+_HELP_BASE_VARIANTS = {
+    (en_zh, zh_en): _HELP_BASE.format(
+        en_zh='✅' if en_zh else '❌',
+        zh_en='✅' if zh_en else '❌'
+    )
+    for en_zh in (False, True)
+    for zh_en in (False, True)
+}
+_HELP_ADMIN_SUFFIX = (
+    "*Settings*\n"
+    "Rate limit: {rate_limit} messages per {rate_window}s\n"
+    "Inactive days threshold: {inactive_days} days\n"
+    "*Admin Commands*\n"
+    "/configure rate\\_limit <number> - Set message rate limit\n"
+    "/configure rate\\_window <seconds> - Set time window\n"
+    "/configure inactive\\_days <days> - Set inactive threshold\n"
+    "/import\\_user [filename] - Import member to database\n"
+    "/print\\_db - Print the member database."
+)
 
 async def help_command(
     update: Update,
@@ -123,42 +555,27 @@ async def help_command(
 ) -> None:
     """Show help message with available commands"""
     # Delete command message immediately
-    asyncio.create_task(delete_command_message(update))
+    schedule_command_delete(update)
     
     chat_id = update.effective_chat.id
     try:
+        admin = await is_admin(update, context, config)
         chat_config = await config_manager.get_config(chat_id)
-        
-        help_text = (
-            f"*Translations (翻译设置):*\n"
-            "Toggle EN→ZH translation (开关英中翻译):\n"
-            "\t\t/toggle\\_translation\\_en\\_to\\_zh\n"
-            "Toggle ZH→EN translation (开关中英翻译):\n"
-            "\t\t/toggle\\_translation\\_zh\\_to\\_en\n"
-            "Current Setting:\n"
-            f"EN→ZH (英中翻译) {'✅' if chat_config['translate_en_to_zh'] else '❌'}, "
-            f"ZH→EN (中英翻译) {'✅' if chat_config['translate_zh_to_en'] else '❌'}\n"
-        )
 
-        if await is_admin(update, context, config):
-            help_text += (
-                "*Settings*\n"
-                f"Rate limit: {chat_config['rate_limit_messages']} messages per {chat_config['rate_limit_window']}s\n"
-                f"Inactive days threshold: {chat_config['inactive_days_threshold']} days\n"
-                "*Admin Commands*\n"
-                "/configure rate\\_limit <number> - Set message rate limit\n"
-                "/configure rate\\_window <seconds> - Set time window\n"
-                "/configure inactive_days <days> - Set inactive threshold\n"
-                "/import\\_user [filename] - Import member to database\n"
-                "/print\\_db - Print the member database."
+        help_text = _HELP_BASE_VARIANTS[chat_config.translate_en_to_zh, chat_config.translate_zh_to_en]
+        if admin:
+            help_text += _HELP_ADMIN_SUFFIX.format(
+                rate_limit=chat_config.rate_limit_messages,
+                rate_window=chat_config.rate_limit_window,
+                inactive_days=chat_config.inactive_days_threshold
             )
 
         response = await update.message.reply_text(help_text, parse_mode='Markdown')
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
     except Exception as e:
         logger.error(f"Error in help command: {e}")
         response = await update.message.reply_text("Error showing help. Please try again later.")
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
 
 async def handle_new_members(
     update: Update,
@@ -170,14 +587,42 @@ async def handle_new_members(
     if not update.message.new_chat_members:
         return
     chat_id = update.effective_chat.id
-    for member in update.message.new_chat_members:
-        if not member.is_bot:
-            try:
-                logger.info(f"New member {member.id} joined chat {chat_id}")
-                await db.update_user_activity(member.id, chat_id)
-                logger.debug(f"Added new member {member.id} to activity tracking")
-            except Exception as e:
-                logger.error(f"Error tracking new member {member.id}: {e}", exc_info=True)
+    members = [member for member in update.message.new_chat_members if not member.is_bot]
+    results = await asyncio.gather(
+        *(record_user_activity(db, member.id, chat_id) for member in members),
+        return_exceptions=True
+    )
+    for member, result in zip(members, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error tracking new member {member.id}: {result}", exc_info=result)
+        else:
+            logger.info(f"New member {member.id} joined chat {chat_id}")
+
+class SettingSpec(NamedTuple):
+    """Validation and reply text for one /configure setting"""
+    field: str
+    minimum: int
+    maximum: int
+    range_error: str
+    success: str
+
+_CONFIG_SETTINGS: Dict[str, SettingSpec] = {
+    'rate_limit': SettingSpec(
+        'rate_limit_messages', 1, 100,
+        'Rate limit must be between 1 and 100',
+        'Rate limit set to {value} messages per {config.rate_limit_window} seconds'
+    ),
+    'rate_window': SettingSpec(
+        'rate_limit_window', 1, 3600,
+        'Rate window must be between 1 and 3600 seconds',
+        'Rate limit window set to {value} seconds'
+    ),
+    'inactive_days': SettingSpec(
+        'inactive_days_threshold', 1, 365,
+        'Inactive days must be between 1 and 365',
+        'Inactive threshold set to {value} days'
+    ),
+}
 
 async def configure_command(
     update: Update,
@@ -188,13 +633,13 @@ async def configure_command(
 ) -> None:
     """Handle bot configuration"""
     # Delete command message immediately
-    asyncio.create_task(delete_command_message(update))
+    schedule_command_delete(update)
     
     chat_id = update.effective_chat.id
     
     if not await is_admin(update, context, config):
         response = await update.message.reply_text('This command is only available to administrators.')
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
         return
 
     if len(context.args) != 2:
@@ -205,69 +650,58 @@ async def configure_command(
             '• rate_window - Time window in seconds\n'
             '• inactive_days - Days before user is considered inactive'
         )
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
         return
 
     setting, value = context.args[0].lower(), context.args[1]
+    spec = _CONFIG_SETTINGS.get(setting)
+    if spec is None:
+        await reply_status(update, context, 'Invalid setting')
+        return
+
     try:
         value = int(value)
-        current_config = await config_manager.get_config(chat_id)
-        
-        if setting == 'rate_limit':
-            if 1 <= value <= 100:
-                current_config['rate_limit_messages'] = value
-                await config_manager.update_config(chat_id, current_config)
-                response = await update.message.reply_text(
-                    f'Rate limit set to {value} messages per {current_config["rate_limit_window"]} seconds'
-                )
-            else:
-                response = await update.message.reply_text('Rate limit must be between 1 and 100')
-        elif setting == 'rate_window':
-            if 1 <= value <= 3600:
-                current_config['rate_limit_window'] = value
-                await config_manager.update_config(chat_id, current_config)
-                response = await update.message.reply_text(f'Rate limit window set to {value} seconds')
-            else:
-                response = await update.message.reply_text('Rate window must be between 10 and 3600 seconds')
-        elif setting == 'inactive_days':
-            if 1 <= value <= 365:
-                current_config['inactive_days_threshold'] = value
-                await config_manager.update_config(chat_id, current_config)
-                response = await update.message.reply_text(f'Inactive threshold set to {value} days')
-            else:
-                response = await update.message.reply_text('Inactive days must be between 1 and 365')
-        else:
-            response = await update.message.reply_text('Invalid setting')
-            
-        asyncio.create_task(delete_message_after_delay(response))
-        
     except ValueError:
-        response = await update.message.reply_text('Value must be a number')
-        asyncio.create_task(delete_message_after_delay(response))
+        await reply_status(update, context, 'Value must be a number')
+        return
 
-async def toggle_translation_en_to_zh(
+    if not spec.minimum <= value <= spec.maximum:
+        await reply_status(update, context, spec.range_error)
+        return
+
+    current_config = await config_manager.get_config(chat_id)
+    current_config = current_config._replace(**{spec.field: value})
+    await config_manager.update_config(chat_id, current_config)
+    await reply_status(update, context, spec.success.format(value=value, config=current_config))
+
+async def _toggle_translation(
     update: Update,
     context: CallbackContext,
     config_manager,
-    **kwargs
+    field: str,
+    label: str
 ) -> None:
-    """Toggle English to Chinese translation"""
-    asyncio.create_task(delete_command_message(update))
+    """Flip a translation flag in the chat config and report the new state"""
+    schedule_command_delete(update)
     chat_id = update.effective_chat.id
     try:
         current_config = await config_manager.get_config(chat_id)
-        new_state = not current_config['translate_en_to_zh']
-        current_config['translate_en_to_zh'] = new_state
+        new_state = not getattr(current_config, field)
+        current_config = current_config._replace(**{field: new_state})
         await config_manager.update_config(chat_id, current_config)
-        state_str = 'enabled' if new_state else 'disabled'
-        CHECK_MARK = '✅' 
-        X_MARK = '❌'
-        response = await update.message.reply_text(f'EN→ZH (英中翻译): {CHECK_MARK if state_str == "enabled" else X_MARK}')
-        asyncio.create_task(delete_message_after_delay(response))
+        await reply_status(update, context, f'{label}: {"✅" if new_state else "❌"}')
     except Exception as e:
-        logger.error(f"Error toggling EN→ZH translation: {e}")
-        response = await update.message.reply_text("Failed to toggle translation setting")
-        asyncio.create_task(delete_message_after_delay(response))
+        logger.error(f"Error toggling {label} translation: {e}")
+        await reply_status(update, context, "Failed to toggle translation setting")
+
+async def toggle_translation_en_to_zh(
+    update: Update,
+    context: CallbackContext,
+    config_manager,
+    **kwargs
+) -> None:
+    """Toggle English to Chinese translation"""
+    await _toggle_translation(update, context, config_manager, 'translate_en_to_zh', 'EN→ZH (英中翻译)')
 
 async def toggle_translation_zh_to_en(
     update: Update,
@@ -276,22 +710,48 @@ async def toggle_translation_zh_to_en(
     **kwargs
 ) -> None:
     """Toggle Chinese to English translation"""
-    asyncio.create_task(delete_command_message(update))
-    chat_id = update.effective_chat.id
-    try:
-        current_config = await config_manager.get_config(chat_id)
-        new_state = not current_config['translate_zh_to_en']
-        current_config['translate_zh_to_en'] = new_state
-        await config_manager.update_config(chat_id, current_config)
-        state_str = 'enabled' if new_state else 'disabled'
-        CHECK_MARK = '✅'
-        X_MARK = '❌'
-        response = await update.message.reply_text(f'ZH→EN (中英翻译): {CHECK_MARK if state_str == "enabled" else X_MARK}')
-        asyncio.create_task(delete_message_after_delay(response))
-    except Exception as e:
-        logger.error(f"Error toggling ZH→EN translation: {e}")
-        response = await update.message.reply_text("Failed to toggle translation setting")
-        asyncio.create_task(delete_message_after_delay(response))
+    await _toggle_translation(update, context, config_manager, 'translate_zh_to_en', 'ZH→EN (中英翻译)')
+
+TELEGRAM_FANOUT_LIMIT = 8
+
+async def gather_bounded(coros, limit: int = TELEGRAM_FANOUT_LIMIT) -> List:
+    """Run Telegram API calls concurrently, at most `limit` at a time"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+MESSAGE_CHUNK_LIMIT = 3800  # Leave headroom under Telegram's 4096 character limit
+_USER_LINE = "• {} (msgs: {}, last: {})\n".format
+
+def _user_activity_lines(users: List[Dict], members: List, include_missing: bool) -> Iterator[str]:
+    """Yield one activity line per user from member lookups aligned with users"""
+    for user, member in zip(users, members):
+        if isinstance(member, Exception):
+            logger.warning(f"Could not get member info for {user['user_id']}: {member}")
+            if include_missing:
+                yield f"• User {user['user_id']} (not found)\n"
+            continue
+        username = member.user.username or member.user.first_name or str(user['user_id'])
+        yield _USER_LINE(username, user['messages_count'], user['last_active'].split('.')[0])
+
+async def reply_in_chunks(update: Update, parts: Iterable[str], limit: int = MESSAGE_CHUNK_LIMIT) -> None:
+    """Send text parts in as few replies as possible, each within the length limit"""
+    chunk: List[str] = []
+    size = 0
+    for part in parts:
+        if chunk and size + len(part) > limit:
+            response = await update.message.reply_text("".join(chunk))
+            schedule_delete(response)
+            chunk, size = [], 0
+        chunk.append(part)
+        size += len(part)
+    if chunk:
+        response = await update.message.reply_text("".join(chunk))
+        schedule_delete(response)
 
 async def print_database_command(
     update: Update, 
@@ -302,14 +762,14 @@ async def print_database_command(
     **kwargs
 ) -> None:
     """Print database information based on context and user permissions"""
-    asyncio.create_task(delete_command_message(update))
+    schedule_command_delete(update)
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
     chat_type = update.effective_chat.type
     
     if not ((user_id == config.BOT_OWNER_ID and chat_type == 'private') or await is_admin(update, context, config)):
         response = await update.message.reply_text('This command is only available to administrators.')
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
         return
 
     try:
@@ -319,67 +779,68 @@ async def print_database_command(
             
             if not chat_ids:
                 response = await update.message.reply_text("No chat data found in database.")
-                asyncio.create_task(delete_message_after_delay(response))
+                schedule_delete(response)
                 return
                 
-            for chat_id in chat_ids:
+            chats = await gather_bounded(get_chat_cached(context.bot, chat_id) for chat_id in chat_ids)
+            for chat_id, chat in zip(chat_ids, chats):
                 try:
-                    chat = await context.bot.get_chat(chat_id)
+                    if isinstance(chat, Exception):
+                        raise chat
                     chat_title = chat.title or f"Chat {chat_id}"
                     
                     chat_config = await config_manager.get_config(chat_id)
                     stats = await db.get_chat_statistics(chat_id)
                     users = await db.get_chat_user_activity(chat_id, limit=10)
+                    en_zh = 'on' if chat_config.translate_en_to_zh else 'off'
+                    zh_en = 'on' if chat_config.translate_zh_to_en else 'off'
+                    rlm = chat_config.rate_limit_messages
+                    rlw = chat_config.rate_limit_window
+                    inact = chat_config.inactive_days_threshold
                     
-                    message = (
+                    parts = [(
                         f"Chat Information: {chat_title}\n"
                         f"Chat ID: {chat_id}\n\n"
                         "Configuration:\n"
-                        f"• Rate Limit: {chat_config['rate_limit_messages']} per {chat_config['rate_limit_window']}s\n"
-                        f"• Translations: EN→ZH: {'on' if chat_config['translate_en_to_zh'] else 'off'}, "
-                        f"ZH→EN: {'on' if chat_config['translate_zh_to_en'] else 'off'}\n"
-                        f"• Inactive threshold: {chat_config['inactive_days_threshold']} days\n\n"
+                        f"• Rate Limit: {rlm} per {rlw}s\n"
+                        f"• Translations: EN→ZH: {en_zh}, "
+                        f"ZH→EN: {zh_en}\n"
+                        f"• Inactive threshold: {inact} days\n\n"
                         "Statistics:\n"
                         f"• Total Users: {stats['total_users']}\n"
                         f"• Total Messages: {stats['total_messages']}\n"
                         f"• Avg Messages/User: {stats['avg_messages_per_user']:.1f}\n\n"
                         "Recent Active Users:\n"
-                    )
-                    
-                    for user in users:
-                        try:
-                            member = await context.bot.get_chat_member(chat_id, user['user_id'])
-                            username = (
-                                member.user.username or 
-                                member.user.first_name or 
-                                str(user['user_id'])
-                            )
-                            timestamp = user['last_active'].split('.')[0]
-                            message += f"• {username} (msgs: {user['messages_count']}, last: {timestamp})\n"
-                        except Exception as e:
-                            logger.warning(f"Could not get member info for {user['user_id']}: {e}")
-                            message += f"• User {user['user_id']} (not found)\n"
+                    )]
                     
-                    response = await update.message.reply_text(message)
-                    asyncio.create_task(delete_message_after_delay(response))
+                    members = await gather_bounded(
+                        get_chat_member_cached(context.bot, chat_id, user['user_id']) for user in users
+                    )
+                    parts.extend(_user_activity_lines(users, members, include_missing=True))
+                    await reply_in_chunks(update, parts)
                     
                 except Exception as e:
                     logger.error(f"Error processing chat {chat_id}: {e}")
                     response = await update.message.reply_text(f"Error processing chat {chat_id}")
-                    asyncio.create_task(delete_message_after_delay(response))
+                    schedule_delete(response)
         
         # When admin uses command in group chat
         else:
             chat_config = await config_manager.get_config(chat_id)
             stats = await db.get_chat_statistics(chat_id)
             users = await db.get_chat_user_activity(chat_id)
+            en_zh = 'on' if chat_config.translate_en_to_zh else 'off'
+            zh_en = 'on' if chat_config.translate_zh_to_en else 'off'
+            rlm = chat_config.rate_limit_messages
+            rlw = chat_config.rate_limit_window
+            inact = chat_config.inactive_days_threshold
             
             config_text = (
                 "Current Configuration:\n"
-                f"• Rate Limit: {chat_config['rate_limit_messages']} messages per {chat_config['rate_limit_window']}s\n"
-                f"• Inactive threshold: {chat_config['inactive_days_threshold']} days\n"
-                f"• EN→ZH Translation: {'on' if chat_config['translate_en_to_zh'] else 'off'}\n"
-                f"• ZH→EN Translation: {'on' if chat_config['translate_zh_to_en'] else 'off'}\n\n"
+                f"• Rate Limit: {rlm} messages per {rlw}s\n"
+                f"• Inactive threshold: {inact} days\n"
+                f"• EN→ZH Translation: {en_zh}\n"
+                f"• ZH→EN Translation: {zh_en}\n\n"
                 "Statistics:\n"
                 f"• Total Users: {stats['total_users']}\n"
                 f"• Total Messages: {stats['total_messages']}\n"
@@ -388,39 +849,17 @@ async def print_database_command(
             )
             
             response = await update.message.reply_text(config_text)
-            asyncio.create_task(delete_message_after_delay(response))
-            
-            user_text = ""
-            for user in users:
-                try:
-                    member = await context.bot.get_chat_member(chat_id, user['user_id'])
-                    username = (
-                        member.user.username or 
-                        member.user.first_name or 
-                        str(user['user_id'])
-                    )
-                    timestamp = user['last_active'].split('.')[0]
-                    user_line = f"• {username} (msgs: {user['messages_count']}, last: {timestamp})\n"
-                    
-                    if len(user_text) + len(user_line) > 3000:
-                        response = await update.message.reply_text(user_text)
-                        asyncio.create_task(delete_message_after_delay(response))
-                        user_text = user_line
-                    else:
-                        user_text += user_line
-                        
-                except Exception as e:
-                    logger.warning(f"Could not get member info for {user['user_id']}: {e}")
-                    continue
+            schedule_delete(response)
             
-            if user_text:
-                response = await update.message.reply_text(user_text)
-                asyncio.create_task(delete_message_after_delay(response))
+            members = await gather_bounded(
+                get_chat_member_cached(context.bot, chat_id, user['user_id']) for user in users
+            )
+            await reply_in_chunks(update, _user_activity_lines(users, members, include_missing=False))
 
     except Exception as e:
         logger.error(f"Error processing print_db: {e}", exc_info=True)
         response = await update.message.reply_text("An error occurred while fetching database information.")
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
 
 async def import_users_command(
     update: Update, 
@@ -430,24 +869,24 @@ async def import_users_command(
     **kwargs
 ) -> None:
     """Handle /import_users command"""
-    asyncio.create_task(delete_command_message(update))
+    schedule_command_delete(update)
     if not await is_admin(update, context, config):
         response = await update.message.reply_text('This command is only available to administrators.')
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
         return
         
     if len(context.args) != 1:
         response = await update.message.reply_text("Usage: /import_users [filename]")
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
         return
 
     filename = context.args[0]
-    file_path = os.path.join('csv', filename)
-
-    if not os.path.exists(file_path):
-        response = await update.message.reply_text(f"File {filename} not found in csv directory.")
-        asyncio.create_task(delete_message_after_delay(response))
+    # Only plain .csv file names inside the csv directory are allowed
+    if os.path.basename(filename) != filename or not filename.lower().endswith('.csv'):
+        response = await update.message.reply_text("Invalid filename. Use a .csv file name from the csv directory.")
+        schedule_delete(response)
         return
+    file_path = os.path.join('csv', filename)
 
     try:
         stats = await db.import_users_from_file(
@@ -469,36 +908,56 @@ async def import_users_command(
                 response += f"\n...and {len(stats['error_details']) - 5} more errors"
                 
         response = await update.message.reply_text(response)
-        asyncio.create_task(delete_message_after_delay(response))
+        schedule_delete(response)
+    except FileNotFoundError:
+        response = await update.message.reply_text(f"File {filename} not found in csv directory.")
+        schedule_delete(response)
     except Exception as e:
         logger.error(f"Error during user import: {e}", exc_info=True)
         response = await update.message.reply_text(f"Failed to import users from {filename}: {str(e)}")
 
+KICK_CONCURRENCY = 10
+
 async def kick_inactive_members(
     db,
-    context: CallbackContext
+    context: CallbackContext,
+    chat_ids: List[int]
 ) -> None:
-    """Kick inactive members from the group"""
+    """Kick inactive members from a batch of groups"""
     try:
-        chat_id = context.bot_data.get('chat_id')
-        if not chat_id:
-            return
-
-        # Get chat-specific config
+        # Get chat-specific thresholds, then read every chat's inactive users in one pass
         config_manager = context.bot_data['config_manager']
-        chat_config = await config_manager.get_config(chat_id)
-        
-        inactive_users = await db.get_inactive_users(
-            chat_id,
-            chat_config['inactive_days_threshold']
-        )
+        chat_configs = await asyncio.gather(*(config_manager.get_config(chat_id) for chat_id in chat_ids))
+        thresholds = {
+            chat_id: chat_config.inactive_days_threshold
+            for chat_id, chat_config in zip(chat_ids, chat_configs)
+        }
+        # Never kick the bot owner
+        owner_id = context.bot_data['config'].BOT_OWNER_ID
+        targets = [
+            (chat_id, user_id)
+            for chat_id, user_id in await db.get_inactive_users_many(thresholds)
+            if user_id != owner_id
+        ]
         
-        for user_id in inactive_users:
-            try:
-                await context.bot.ban_chat_member(chat_id, user_id)
-                await context.bot.unban_chat_member(chat_id, user_id)  # Unban so they can rejoin
-                logger.info(f"Kicked inactive user {user_id} from chat {chat_id}")
-            except Exception as e:
-                logger.error(f"Failed to kick user {user_id}: {e}")
+        # One semaphore across all chats keeps the total Telegram call rate bounded
+        semaphore = asyncio.Semaphore(KICK_CONCURRENCY)
+
+        async def kick(chat_id: int, user_id: int) -> None:
+            async with semaphore:
+                try:
+                    await context.bot.ban_chat_member(chat_id, user_id)
+                    await context.bot.unban_chat_member(chat_id, user_id)  # Unban so they can rejoin
+                    logger.info(f"Kicked inactive user {user_id} from chat {chat_id}")
+                except Exception as e:
+                    logger.error(f"Failed to kick user {user_id} from chat {chat_id}: {e}")
+
+        await asyncio.gather(*(kick(chat_id, user_id) for chat_id, user_id in targets))
     except Exception as e:
-        logger.error(f"Error in kick_inactive_members: {e}")
\ No newline at end of file
+        logger.error(f"Error in kick_inactive_members: {e}")
+
+async def kick_all_inactive(db, context: CallbackContext) -> None:
+    """Kick inactive members from every known group"""
+    # Activity is also recorded for private chats, which have positive ids and nobody to kick
+    group_ids = [chat_id for chat_id in await db.get_all_chat_ids() if chat_id < 0]
+    await kick_inactive_members(db, context, group_ids)
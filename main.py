@@ -2,30 +2,59 @@
 """
 Main bot application with detailed logging
 """
+import asyncio
+import atexit
+import gzip
 import logging
 import os
+import queue
+import shutil
+from functools import partial
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from telegram import Update
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, 
+    Application, CommandHandler, MessageHandler, ChatMemberHandler,
     filters
 )
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+try:
+    import uvloop
+except ImportError:  # uvloop is unavailable on Windows
+    uvloop = None
+else:
+    # Set before importing handlers, whose module-level asyncio primitives bind to a loop on Python < 3.10
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 from database import DatabaseManager
 from server_config import ServerConfigManager
 from config import get_config
 from handlers import (
     help_command, configure_command, handle_message,
     toggle_translation_en_to_zh, toggle_translation_zh_to_en,
-    kick_inactive_members, handle_new_members, 
-    print_database_command, import_users_command
+    kick_all_inactive, handle_new_members, 
+    print_database_command, import_users_command,
+    activity_flush_loop, flush_activity_buffer, warmup,
+    TRANSLATE_POOL, translation_batcher, start_delete_scheduler,
+    handle_chat_member_update
 )
 
 logger = logging.getLogger(__name__)
 
+# Handler filters, built once at import
+USER_MESSAGE = filters.UpdateType.MESSAGE & ~filters.StatusUpdate.ALL
+NEW_MEMBERS = filters.StatusUpdate.NEW_CHAT_MEMBERS
+
+# Only request update types that have handlers; chat member updates must be asked for explicitly
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CHAT_MEMBER, Update.MY_CHAT_MEMBER]
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Compress a rolled-over log file into its backup name"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
 def setup_logging() -> None:
-    """Configure logging with detailed formatting and size limit"""
+    """Configure logging with detailed formatting and size limit, writing from a background thread"""
     # Create logs directory if it doesn't exist
     logs_dir = 'logs'
     os.makedirs(logs_dir, exist_ok=True)
@@ -55,15 +84,23 @@ def setup_logging() -> None:
         maxBytes=max_log_size,
         backupCount=backup_count
     )
+    # Keep rolled-over backups gzipped
+    file_handler.namer = lambda name: name + '.gz'
+    file_handler.rotator = _gzip_rotator
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(detailed_formatter)
-    root_logger.addHandler(file_handler)
 
     # Console handler for INFO and above
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(simple_formatter)
-    root_logger.addHandler(console_handler)
+
+    # Handlers only enqueue records; file and console I/O (including rotation) happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
     # Suppress noisy modules
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -75,24 +112,46 @@ def setup_logging() -> None:
 async def post_init(application: Application, db: DatabaseManager) -> None:
     logger.info("Running post-init setup")
     try:
+        # Start background flusher for buffered activity updates
+        application.bot_data['activity_stop'] = asyncio.Event()
+        application.bot_data['activity_flusher'] = asyncio.create_task(
+            activity_flush_loop(db, application.bot_data['activity_stop'])
+        )
+
+        # Start scheduler that auto-deletes bot replies and commands
+        application.bot_data['delete_scheduler'] = start_delete_scheduler()
+
+        # Start coalescing translation requests
+        translation_batcher.start()
+
+        # Pre-warm config and translator caches
+        await warmup(db, application.bot_data['config_manager'])
+
         # Initialize scheduler
         application.bot_data['scheduler'] = AsyncIOScheduler()
         
-        # Add kick inactive members job
+        # Add kick inactive members job across all known chats.
+        # Coroutine functions are awaited on the event loop by AsyncIOScheduler;
+        # coalesce, max_instances and misfire_grace_time keep missed or slow runs from piling up
         application.bot_data['scheduler'].add_job(
-            lambda: kick_inactive_members(
-                db,
-                application
-            ),
+            kick_all_inactive,
             'interval',
-            days=1
+            days=1,
+            args=[db, application],
+            coalesce=True,
+            max_instances=1,
+            misfire_grace_time=3600
         )
         
         # Add database cleanup job
         application.bot_data['scheduler'].add_job(
-            lambda: db.cleanup_old_chats(90),  # Cleanup chats inactive for 90 days
+            db.cleanup_old_chats,
             'interval',
-            days=7  # Run weekly
+            days=7,  # Run weekly
+            args=[90],  # Cleanup chats inactive for 90 days
+            coalesce=True,
+            max_instances=1,
+            misfire_grace_time=86400
         )
         
         application.bot_data['scheduler'].start()
@@ -100,21 +159,46 @@ async def post_init(application: Application, db: DatabaseManager) -> None:
     except Exception as e:
         logger.error(f"Error in post_init: {e}", exc_info=True)
 
+async def stop_activity_flusher(application: Application) -> None:
+    """Stop the activity flusher, write out anything still buffered and close the database"""
+    flusher = application.bot_data.get('activity_flusher')
+    if flusher is not None:
+        # Signal rather than cancel, so a flush in progress commits before the loop exits
+        application.bot_data['activity_stop'].set()
+        await flusher
+    db = application.bot_data.get('db')
+    if db is not None:
+        await flush_activity_buffer(db)
+        await db.cleanup()
+
+async def stop_translation() -> None:
+    """Stop translation batching and release translator worker threads"""
+    await translation_batcher.stop()
+    TRANSLATE_POOL.shutdown(wait=False, cancel_futures=True)
+
 async def shutdown(application: Application) -> None:
     """Cleanup resources on shutdown"""
     logger.info("Running shutdown cleanup")
-    try:
-        # Stop scheduler
-        if 'scheduler' in application.bot_data:
-            application.bot_data['scheduler'].shutdown()
-            
-        # Cleanup database connections
-        if 'config_manager' in application.bot_data:
-            await application.bot_data['config_manager'].cleanup()
-            
+    # Stop scheduler without waiting on running jobs
+    scheduler = application.bot_data.get('scheduler')
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+
+    # Stop message deletion scheduler
+    if 'delete_scheduler' in application.bot_data:
+        application.bot_data['delete_scheduler'].cancel()
+
+    # Independent teardown paths run concurrently, and one failing does not skip the others
+    teardown = [stop_activity_flusher(application), stop_translation()]
+    if 'config_manager' in application.bot_data:
+        teardown.append(application.bot_data['config_manager'].cleanup())
+    results = await asyncio.gather(*teardown, return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    for error in errors:
+        logger.error(f"Error during shutdown: {error}", exc_info=error)
+    if not errors:
         logger.info("Cleanup completed successfully")
-    except Exception as e:
-        logger.error(f"Error during shutdown: {e}", exc_info=True)
 
 def main() -> None:
     """Start the bot with detailed logging"""
@@ -134,11 +218,15 @@ def main() -> None:
         config_manager = ServerConfigManager(config)
         logger.info("Database and config manager initialized")
 
+        if uvloop is not None:
+            logger.info("Using uvloop event loop")
+
         # Initialize application
         logger.debug("Building application")
         application = (
             Application.builder()
             .token(config.TOKEN)
+            .concurrent_updates(True)
             .post_init(lambda app: post_init(app, db))
             .post_shutdown(shutdown)
             .build()
@@ -151,45 +239,53 @@ def main() -> None:
         application.bot_data['db'] = db
         application.bot_data['config_manager'] = config_manager
 
-        # Setup handler dependencies
-        def get_handler_deps(context):
-            return {
-                'db': context.application.bot_data['db'],
-                'config': context.application.bot_data['config'],
-                'config_manager': context.application.bot_data['config_manager']
-            }
+        # Bind handler dependencies once so dispatch is a direct call
+        deps = {'db': db, 'config': config, 'config_manager': config_manager}
 
         # Add handlers
         logger.debug("Adding command handlers")
         application.add_handler(CommandHandler("help", 
-            lambda update, context: help_command(update, context, **get_handler_deps(context))))
+            partial(help_command, **deps)))
         application.add_handler(CommandHandler("configure",
-            lambda update, context: configure_command(update, context, **get_handler_deps(context))))
+            partial(configure_command, **deps)))
         application.add_handler(CommandHandler("toggle_translation_en_to_zh",
-            lambda update, context: toggle_translation_en_to_zh(update, context, **get_handler_deps(context))))
+            partial(toggle_translation_en_to_zh, **deps)))
         application.add_handler(CommandHandler("toggle_translation_zh_to_en",
-            lambda update, context: toggle_translation_zh_to_en(update, context, **get_handler_deps(context))))
+            partial(toggle_translation_zh_to_en, **deps)))
         application.add_handler(CommandHandler("print_db", 
-            lambda update, context: print_database_command(update, context, **get_handler_deps(context))))
+            partial(print_database_command, **deps)))
         application.add_handler(CommandHandler("import_users", 
-            lambda update, context: import_users_command(update, context, **get_handler_deps(context))))
+            partial(import_users_command, **deps)))
 
         logger.debug("Adding message handlers")
+        # Track activity for every user message and translate plain text in a single handler.
+        # It runs in its own group so commands handled in the default group still count as activity
         application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND,
-            lambda update, context: handle_message(update, context, **get_handler_deps(context))))
+            USER_MESSAGE,
+            partial(handle_message, **deps)),
+            group=1)
         
         # Add new member handler
         logger.debug("Adding new member handler")
         application.add_handler(MessageHandler(
-            filters.StatusUpdate.NEW_CHAT_MEMBERS,
-            lambda update, context: handle_new_members(update, context, **get_handler_deps(context))))
+            NEW_MEMBERS,
+            partial(handle_new_members, **deps)))
+        
+        # Invalidate cached member lookups on status changes
+        logger.debug("Adding chat member handler")
+        application.add_handler(ChatMemberHandler(
+            handle_chat_member_update, ChatMemberHandler.ANY_CHAT_MEMBER))
         
         logger.info("All handlers added successfully")
         
         # Start bot
         logger.info("Starting polling...")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        # Long-poll so Telegram holds each getUpdates request open until updates arrive
+        application.run_polling(
+            allowed_updates=ALLOWED_UPDATES,
+            poll_interval=0.0,
+            timeout=30
+        )
         
     except Exception as e:
         logger.critical("Fatal error during initialization", exc_info=True)
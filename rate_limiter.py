@@ -1,79 +1,148 @@
 # --- rate_limiter.py ---
 """
-Memory-efficient rate limiter using SQLite
+Memory-efficient rate limiter with in-memory windows persisted to SQLite
 """
 import aiosqlite
-from datetime import datetime, timedelta
+import asyncio
+import time
+from collections import deque
 import logging
 from pathlib import Path
+from typing import Deque, Dict, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+RATE_LIMIT_FLUSH_INTERVAL = 5  # Seconds between batched writes of recorded actions
+RATE_LIMIT_MAX_WINDOW = 3600  # Longest window a chat can configure, in seconds
+
 class RateLimiter:
     def __init__(self, db_path: str = 'database/rate_limits.db'):
         self.db_path = db_path
         self._connection = None
+        self._connection_lock = asyncio.Lock()
+        self._flush_task = None
+        self._flush_stop = asyncio.Event()
+        # Checks use monotonic time; this converts to wall-clock time for persisted actions
+        self._clock_offset = time.time() - time.monotonic()
+        # Recent action monotonic timestamps per (chat_id, user_id), newest on the right
+        self._buckets: Dict[Tuple[int, int], Deque[float]] = {}
+        # Actions recorded since the last flush
+        self._pending: List[Tuple[int, int, float]] = []
         # Ensure database directory exists
         Path(db_path).parent.mkdir(exist_ok=True)
 
     async def _get_connection(self) -> aiosqlite.Connection:
         """Get or create database connection"""
         if self._connection is None:
-            self._connection = await aiosqlite.connect(self.db_path)
-            await self._ensure_table()
+            async with self._connection_lock:
+                if self._connection is None:
+                    conn = await aiosqlite.connect(self.db_path)
+                    # WAL keeps the periodic flush an append; NORMAL sync skips the per-commit fsync
+                    await conn.execute('PRAGMA journal_mode=WAL')
+                    await conn.execute('PRAGMA synchronous=NORMAL')
+                    await conn.execute('PRAGMA temp_store=MEMORY')
+                    await conn.execute('PRAGMA busy_timeout=5000')
+                    await self._ensure_table(conn)
+                    await self._load_recent(conn)
+                    self._connection = conn
+                    # Persist recorded actions and sweep idle buckets in the background
+                    self._flush_stop.clear()
+                    self._flush_task = asyncio.create_task(self.flush_loop())
         return self._connection
 
-    async def _ensure_table(self) -> None:
-        """Create rate limits table if it doesn't exist"""
-        await self._connection.execute('''
-            CREATE TABLE IF NOT EXISTS rate_limits (
-                chat_id INTEGER,
-                user_id INTEGER,
-                timestamp TIMESTAMP,
-                PRIMARY KEY (chat_id, user_id, timestamp)
-            );
-            CREATE INDEX IF NOT EXISTS idx_rate_limits_cleanup 
-            ON rate_limits(timestamp);
+    async def _ensure_table(self, conn: aiosqlite.Connection) -> None:
+        """Create rate limit events table if it doesn't exist"""
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_events (
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                timestamp REAL NOT NULL
+            )
+        ''')
+        await conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_rate_limit_events_timestamp
+            ON rate_limit_events(timestamp)
         ''')
-        await self._connection.commit()
+        await conn.commit()
+
+    async def _load_recent(self, conn: aiosqlite.Connection) -> None:
+        """Restore windows from persisted actions so limits survive restarts"""
+        cursor = await conn.execute('''
+            SELECT chat_id, user_id, timestamp FROM rate_limit_events
+            WHERE timestamp > ?
+            ORDER BY timestamp
+        ''', (time.time() - RATE_LIMIT_MAX_WINDOW,))
+        self._buckets.clear()
+        for chat_id, user_id, timestamp in await cursor.fetchall():
+            self._buckets.setdefault((chat_id, user_id), deque()).append(timestamp - self._clock_offset)
 
     async def check_rate_limit(self, chat_id: int, user_id: int, limit: int, window: int) -> bool:
         """Check if user exceeds rate limit"""
-        conn = await self._get_connection()
-        current_time = datetime.now()
-        window_start = current_time - timedelta(seconds=window)
-        
-        # Periodically clean old entries (with 10% probability to reduce overhead)
-        if hash(str(current_time)) % 10 == 0:
-            await conn.execute('DELETE FROM rate_limits WHERE timestamp < ?', (window_start,))
-        
-        # Count recent actions
-        cursor = await conn.execute('''
-            SELECT COUNT(*) FROM rate_limits
-            WHERE chat_id = ? AND user_id = ? AND timestamp > ?
-        ''', (chat_id, user_id, window_start))
-        count = (await cursor.fetchone())[0]
-        
-        if count >= limit:
+        await self._get_connection()
+        current_time = time.monotonic()
+        window_start = current_time - window
+
+        key = (chat_id, user_id)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.maxlen != limit:
+            # Only the newest `limit` actions matter for the check
+            bucket = self._buckets[key] = deque(bucket or (), maxlen=limit)
+
+        # Drop actions that have left the window
+        while bucket and bucket[0] <= window_start:
+            bucket.popleft()
+
+        if len(bucket) >= limit:
             return True
-        
-        # Add new action
-        await conn.execute('''
-            INSERT INTO rate_limits (chat_id, user_id, timestamp)
-            VALUES (?, ?, ?)
-        ''', (chat_id, user_id, current_time))
-        await conn.commit()
-        
+
+        # Record new action; it is written to the database by the next flush
+        bucket.append(current_time)
+        self._pending.append((chat_id, user_id, current_time))
         return False
 
-    async def cleanup(self):
-        """Close database connection and clean old entries"""
-        if self._connection:
-            # Clean old entries before closing
+    async def flush(self) -> None:
+        """Write recorded actions and prune expired ones from memory and disk"""
+        cutoff = time.monotonic() - RATE_LIMIT_MAX_WINDOW
+        # Forget users with no action inside any possible window, so buckets don't accumulate forever
+        stale_keys = [key for key, bucket in self._buckets.items() if not bucket or bucket[-1] < cutoff]
+        for key in stale_keys:
+            del self._buckets[key]
+
+        if self._connection is None:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            if pending:
+                await self._connection.executemany('''
+                    INSERT INTO rate_limit_events (chat_id, user_id, timestamp)
+                    VALUES (?, ?, ?)
+                ''', [(chat_id, user_id, timestamp + self._clock_offset)
+                      for chat_id, user_id, timestamp in pending])
             await self._connection.execute('''
-                DELETE FROM rate_limits 
-                WHERE timestamp < ?
-            ''', (datetime.now() - timedelta(hours=1),))
+                DELETE FROM rate_limit_events WHERE timestamp < ?
+            ''', (cutoff + self._clock_offset,))
             await self._connection.commit()
+        except Exception as e:
+            logger.error(f"Error flushing rate limit events: {e}", exc_info=True)
+
+    async def flush_loop(self) -> None:
+        """Background task that periodically flushes recorded actions until stopped"""
+        while not self._flush_stop.is_set():
+            try:
+                await asyncio.wait_for(self._flush_stop.wait(), RATE_LIMIT_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def cleanup(self):
+        """Stop the flush task, flush recorded actions and close database connection"""
+        if self._flush_task is not None:
+            # Signal rather than cancel, so a flush in progress commits before the task exits
+            self._flush_stop.set()
+            await self._flush_task
+            self._flush_task = None
+        self._flush_stop = asyncio.Event()
+        if self._connection:
+            await self.flush()
             await self._connection.close()
-            self._connection = None
\ No newline at end of file
+            self._connection = None
@@ -3,31 +3,47 @@
 Optimized server configuration management
 """
 import aiosqlite
+import asyncio
 from datetime import datetime
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple
 import json
 from config import BotConfig
 
 logger = logging.getLogger(__name__)
 
+class ChatConfig(NamedTuple):
+    """Per-chat settings with attribute access"""
+    rate_limit_messages: int
+    rate_limit_window: int
+    inactive_days_threshold: int
+    translate_en_to_zh: bool = False
+    translate_zh_to_en: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], defaults: 'ChatConfig') -> 'ChatConfig':
+        """Build config from stored JSON, falling back to defaults for missing keys"""
+        return defaults._replace(**{k: v for k, v in data.items() if k in cls._fields})
+
 class ServerConfigManager:
     def __init__(self, config: BotConfig):
         self.db_path = str(config.paths.config_db)
         self._connection = None
-        self.default_config = {
-            'rate_limit_messages': config.DEFAULT_RATE_LIMIT,
-            'rate_limit_window': config.DEFAULT_RATE_WINDOW,
-            'inactive_days_threshold': config.DEFAULT_INACTIVE_DAYS,
-            'translate_en_to_zh': False,
-            'translate_zh_to_en': False
-        }
+        self._connection_lock = asyncio.Lock()
+        self._cache: Dict[int, ChatConfig] = {}
+        self.default_config = ChatConfig(
+            rate_limit_messages=config.DEFAULT_RATE_LIMIT,
+            rate_limit_window=config.DEFAULT_RATE_WINDOW,
+            inactive_days_threshold=config.DEFAULT_INACTIVE_DAYS
+        )
 
     async def _get_connection(self) -> aiosqlite.Connection:
         """Get or create database connection"""
         if self._connection is None:
-            self._connection = await aiosqlite.connect(self.db_path)
-            await self._ensure_table()
+            async with self._connection_lock:
+                if self._connection is None:
+                    self._connection = await aiosqlite.connect(self.db_path)
+                    await self._ensure_table()
         return self._connection
 
     async def _ensure_table(self) -> None:
@@ -41,8 +57,12 @@ class ServerConfigManager:
         ''')
         await self._connection.commit()
 
-    async def get_config(self, chat_id: int) -> Dict[str, Any]:
+    async def get_config(self, chat_id: int) -> ChatConfig:
         """Get chat-specific configuration"""
+        cached = self._cache.get(chat_id)
+        if cached is not None:
+            return cached
+
         conn = await self._get_connection()
         cursor = await conn.execute('''
             SELECT config_json FROM server_config WHERE chat_id = ?
@@ -50,13 +70,15 @@ class ServerConfigManager:
         row = await cursor.fetchone()
         
         if row:
-            return json.loads(row[0])
+            config = ChatConfig.from_dict(json.loads(row[0]), self.default_config)
+            self._cache[chat_id] = config
+            return config
         
         # Create default config if none exists
         await self.update_config(chat_id, self.default_config)
-        return self.default_config.copy()
+        return self.default_config
 
-    async def update_config(self, chat_id: int, config: Dict[str, Any]) -> None:
+    async def update_config(self, chat_id: int, config: ChatConfig) -> None:
         """Update chat-specific configuration"""
         conn = await self._get_connection()
         await conn.execute('''
@@ -65,8 +87,9 @@ class ServerConfigManager:
             ON CONFLICT(chat_id) DO UPDATE SET
                 config_json = excluded.config_json,
                 last_updated = excluded.last_updated
-        ''', (chat_id, json.dumps(config), datetime.now()))
+        ''', (chat_id, json.dumps(config._asdict()), datetime.now()))
         await conn.commit()
+        self._cache[chat_id] = config
 
     async def cleanup(self):
         """Close database connection"""